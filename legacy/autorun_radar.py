@@ -1,43 +1,40 @@
-import subprocess
 import time
 import logging
 
+from download_hdf5_files import main as dl_main
+from convert_hdf5_to_png import main as convert_main
+from forecast import main as forecast_main
+from s3_upload import main as upload_main
+
 # Konfigurer logging
+# force=True erstatter den konfiguration de importerede scripts har sat op
 logging.basicConfig(
     filename="autorun.log",
     level=logging.DEBUG,
     format="%(asctime)s - %(levelname)s - %(message)s",
+    force=True,
 )
 
 # Definer scripts
-scripts = [
-    ("download_hdf5_files.py", 300),
-    ("convert_hdf5_to_png.py", 300),
-    ("forecast.py", 300),
-    ("s3_upload.py", 300),
-]
+scripts = [dl_main, convert_main, forecast_main, upload_main]
 
 
-def run_script(script_name):
+def run_script(fn):
     try:
-        logging.debug(f"Running {script_name}...")
-        result = subprocess.run(["python", script_name], capture_output=True, text=True)
-        if result.returncode == 0:
-            logging.debug(f"Successfully ran {script_name}")
-            return True
-        else:
-            logging.error(f"Error running {script_name}: {result.stderr}")
-            return False
+        logging.debug(f"Running {fn.__module__}...")
+        fn()
+        logging.debug(f"Successfully ran {fn.__module__}")
+        return True
     except Exception as e:
-        logging.error(f"Exception running {script_name}: {e}")
+        logging.exception(f"Exception running {fn.__module__}: {e}")
         return False
 
 
 def main():
     while True:
 
-        for script_name, interval in scripts:
-            print(run_script(script_name))
+        for fn in scripts:
+            print(run_script(fn))
         print('Venter')
         time.sleep(300)
 
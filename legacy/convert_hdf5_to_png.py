@@ -1,12 +1,12 @@
-import h5py
+import io
 import numpy as np
 import os
 import logging
-import matplotlib.pyplot as plt
-from matplotlib.colors import Normalize, ListedColormap
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
 from PIL import Image, ImageDraw, ImageFont
-from datetime import datetime
-import pytz
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
 
 # Configure logging
 logging.basicConfig(
@@ -19,29 +19,31 @@ logging.basicConfig(
 h5_output_folder = "h5_files"
 png_output_folder = "png_files"
 
+# Load the timestamp font once instead of for every image
+try:
+    _FONT = ImageFont.truetype("arial.ttf", 45)
+except IOError:
+    _FONT = ImageFont.load_default()
+
 # Function to add timestamp to an image
 def add_timestamp(image, timestamp):
     draw = ImageDraw.Draw(image)
-    font_size = 45
-    try:
-        font = ImageFont.truetype("arial.ttf", font_size)
-    except IOError:
-        font = ImageFont.load_default()
     timestamp_text = timestamp.strftime('%d. %B %Y - %H:%M')
-    text_bbox = draw.textbbox((0, 0), timestamp_text, font=font)
+    text_bbox = draw.textbbox((0, 0), timestamp_text, font=_FONT)
     text_width = text_bbox[2] - text_bbox[0]
     text_height = text_bbox[3] - text_bbox[1]
     width, height = image.size
     x = width - text_width - 10
     y = 10
-    draw.text((x, y), timestamp_text, font=font, fill="black")
+    draw.text((x, y), timestamp_text, font=_FONT, fill="black")
     return image
 
+# Danish time zone, looked up once
+danish_tz = ZoneInfo('Europe/Copenhagen')
+
 # Function to convert UTC to Danish time
 def convert_utc_to_danish(utc_time):
-    utc = pytz.utc
-    danish_tz = pytz.timezone('Europe/Copenhagen')
-    utc_dt = utc.localize(utc_time)
+    utc_dt = utc_time.replace(tzinfo=timezone.utc)
     danish_dt = utc_dt.astimezone(danish_tz)
     return danish_dt
 
@@ -58,8 +60,92 @@ colors = [
     (0.5, 0.0, 0.5)   # Purple for intense hail
 ]
 dbz_values = [0, 32, 64, 96, 128, 160, 192, 255]
-cmap = ListedColormap(colors)
-norm = Normalize(vmin=min(dbz_values), vmax=max(dbz_values))
+
+# Precompute the RGBA color for every possible 8-bit value so a frame can be
+# colored with a single lookup. Each value falls into one of the equally wide
+# color bins between the lowest and highest dBZ value, like a ListedColormap.
+palette = np.array([c if len(c) == 4 else c + (1.0,) for c in colors])
+vmin, vmax = min(dbz_values), max(dbz_values)
+bins = np.minimum((np.arange(256) - vmin) * len(colors) // (vmax - vmin), len(colors) - 1)
+LUT = (palette[bins] * 255).astype(np.uint8)
+LUT[:, 3] = 255
+LUT[0] = (0, 0, 0, 0)  # Transparent for 0 values
+LUT[255] = (0, 0, 0, 0)  # 255 marks missing data
+
+# Encode a PNG in memory and write it with a single raw file write
+def _write_png(path, image):
+    buf = io.BytesIO()
+    image.save(buf, format="PNG", compress_level=1, optimize=False)
+    data = buf.getbuffer()
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+# Reusable read buffer, since all radar frames share the same shape
+_BUF = None
+
+# Read the radar dataset into the shared buffer
+def _read_frame(file):
+    global _BUF
+    dset = file['dataset1/data1/data']
+    if _BUF is None or _BUF.shape != dset.shape or _BUF.dtype != dset.dtype:
+        _BUF = np.empty(dset.shape, dtype=dset.dtype)
+    dset.read_direct(_BUF)
+    return _BUF
+
+# Convert a single HDF5 file to PNG
+def _convert_one(file_path, png_folder):
+    import h5py  # Imported lazily so the other scripts don't pay for it
+
+    file_name_without_ext = os.path.splitext(os.path.basename(file_path))[0]
+    try:
+        logging.debug(f"Processing file: {file_path}")
+        with h5py.File(file_path, 'r', rdcc_nbytes=4 << 20) as file:
+            data = _read_frame(file)
+            logging.debug(f"Data shape: {data.shape}")
+
+            # Map to RGBA (with transparency) through the lookup table
+            rgba_data = LUT[data]
+
+            # Convert data to PIL Image
+            radar_image = Image.fromarray(rgba_data, 'RGBA')
+
+            # Convert filename timestamp to Danish time and add it to the image
+            try:
+                utc_time = datetime.strptime(file_name_without_ext, '%Y-%m-%dT%H-%M-%SZ')
+                danish_time = convert_utc_to_danish(utc_time)
+                radar_image = add_timestamp(radar_image, danish_time)
+            except ValueError as e:
+                logging.error(f"Error parsing timestamp: {e}")
+                print(f"Error parsing timestamp: {e}")
+
+            # Save as PNG
+            png_path = os.path.join(png_folder, file_name_without_ext + ".png")
+            _write_png(png_path, radar_image)
+            print(f"Saved PNG file: {png_path}")
+            logging.debug(f"Saved PNG file: {png_path}")
+            return png_path
+
+    except FileNotFoundError as e:
+        logging.error(f"File not found error: {e}")
+        print(f"File not found error: {e}")
+    except Exception as e:
+        logging.error(f"An unexpected error occurred: {e}")
+        print(f"An unexpected error occurred: {e}")
+    return None
+
+# Delete a stale PNG file
+def _remove_png(png_folder, png_file):
+    try:
+        os.remove(os.path.join(png_folder, png_file + ".png"))
+        print(f"Deleted PNG file: {png_file}.png")
+        logging.debug(f"Deleted PNG file: {png_file}.png")
+    except Exception as e:
+        logging.error(f"Error deleting file: {e}")
+        print(f"Error deleting file: {e}")
 
 # Convert HDF5 files to PNGs
 def convert_hdf5_to_png(hdf5_files, png_folder):
@@ -67,8 +153,9 @@ def convert_hdf5_to_png(hdf5_files, png_folder):
     if not os.path.exists(png_folder):
         os.makedirs(png_folder)
 
-    existing_png_files = {os.path.splitext(f)[0] for f in os.listdir(png_folder) if f.endswith('.png')}
+    existing_png_files = {e.name[:-4] for e in os.scandir(png_folder) if e.name.endswith('.png')}
     new_png_files = set()
+    todo = []
 
     for file_path in hdf5_files:
         file_name_without_ext = os.path.splitext(os.path.basename(file_path))[0]
@@ -80,62 +167,24 @@ def convert_hdf5_to_png(hdf5_files, png_folder):
             logging.debug(f"Skipping conversion for {file_name_without_ext}.png as it already exists.")
             continue
 
-        try:
-            logging.debug(f"Processing file: {file_path}")
-            with h5py.File(file_path, 'r') as file:
-                # Navigate through the groups to get to the dataset
-                data = file['dataset1']['data1']['data'][:]
-                logging.debug(f"Data shape: {data.shape}")
-
-                # Replace all 255 values with 0
-                data[data == 255] = 0
-
-                # Create a normalized color map with custom colors
-                mapped_data = cmap(norm(data))
-
-                # Convert to RGBA format (with transparency)
-                rgba_data = (mapped_data * 255).astype(np.uint8)
-                rgba_data[..., 3] = np.where(data == 0, 0, 255)  # Set transparency for 0 values
-
-                # Convert data to PIL Image
-                radar_image = Image.fromarray(rgba_data, 'RGBA')
-
-                # Convert filename timestamp to Danish time and add it to the image
-                try:
-                    utc_time = datetime.strptime(file_name_without_ext, '%Y-%m-%dT%H-%M-%SZ')
-                    danish_time = convert_utc_to_danish(utc_time)
-                    radar_image = add_timestamp(radar_image, danish_time)
-                except ValueError as e:
-                    logging.error(f"Error parsing timestamp: {e}")
-                    print(f"Error parsing timestamp: {e}")
-
-                # Save as PNG
-                png_path = os.path.join(png_folder, file_name_without_ext + ".png")
-                radar_image.save(png_path)
-                print(f"Saved PNG file: {png_path}")
-                logging.debug(f"Saved PNG file: {png_path}")
-
-        except FileNotFoundError as e:
-            logging.error(f"File not found error: {e}")
-            print(f"File not found error: {e}")
-        except Exception as e:
-            logging.error(f"An unexpected error occurred: {e}")
-            print(f"An unexpected error occurred: {e}")
+        todo.append((file_path, png_folder))
+
+    # Each file is independent, so convert them in parallel; in steady state
+    # there are only one or two new frames, so size the pool to the work
+    if len(todo) == 1:
+        _convert_one(*todo[0])
+    elif todo:
+        with Pool(processes=min(os.cpu_count(), len(todo))) as pool:
+            pool.starmap(_convert_one, todo)
 
     # Delete PNG files that do not match the fetched HDF5 file names
-    for png_file in existing_png_files:
-        if png_file not in new_png_files:
-            try:
-                os.remove(os.path.join(png_folder, png_file + ".png"))
-                print(f"Deleted PNG file: {png_file}.png")
-                logging.debug(f"Deleted PNG file: {png_file}.png")
-            except Exception as e:
-                logging.error(f"Error deleting file: {e}")
-                print(f"Error deleting file: {e}")
+    stale = existing_png_files - new_png_files
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda png_file: _remove_png(png_folder, png_file), stale))
 
 def main():
     logging.debug("Starting main function")
-    hdf5_files = [os.path.join(h5_output_folder, file) for file in os.listdir(h5_output_folder) if file.endswith('.h5')]
+    hdf5_files = [e.path for e in os.scandir(h5_output_folder) if e.name.endswith('.h5')]
     if hdf5_files:
         logging.debug(f"Found HDF5 files: {hdf5_files}")
         convert_hdf5_to_png(hdf5_files, png_output_folder)
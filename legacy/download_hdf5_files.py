@@ -1,9 +1,13 @@
 import os
-import re
+import json
+import shutil
+import socket
 import requests
 import urllib.parse
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -21,19 +25,31 @@ limit = 40
 bbox = "7.0,54.0,16.0,58.0"  # Bounding box parameters
 h5_output_folder = "h5_files"
 png_output_folder = "png_files"
+meta_file_name = ".meta.json"  # ETags of downloaded files, kept in the output folder
+revalidate_latest = 2  # Only the newest frames are revalidated, older ones are final
+
+# Shared HTTP session so downloads reuse pooled keep-alive connections
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
 
 # Check for internet connection
-def check_internet_connection():
+def check_internet_connection(timeout=1.5):
+    # A bare TCP handshake with a public DNS server is enough to tell if we are online
     try:
-        requests.get("http://www.google.com", timeout=5)
-        return True
-    except requests.ConnectionError:
+        with socket.create_connection(("1.1.1.1", 53), timeout=timeout):
+            return True
+    except OSError:
         return False
 
+# Characters that are not allowed in filenames
+_SANITIZE_TABLE = str.maketrans('', '', '\\/:*?"<>|')
+
+# Minute markers of the files we skip
+_SKIPPED_MINUTES = frozenset(('05', '15', '25', '35', '45', '55'))
+
 # Sanitize filename
 def sanitize_filename(filename):
-    sanitized_filename = re.sub(r'[\\/:*?"<>|]', '', filename)
-    return sanitized_filename
+    return filename.translate(_SANITIZE_TABLE)
 
 # Get current UTC time formatted for the API call
 def get_current_utc_time():
@@ -70,15 +86,63 @@ def fetch_latest_radar_data(api_url, api_key, limit, bbox):
 
 # Skip files based on minute marker
 def should_skip_file(file_datetime):
-    minute_marker = int(file_datetime[14:16])  # Extract the minute part
-    return minute_marker % 10 == 5
+    return file_datetime[14:16] in _SKIPPED_MINUTES  # Compare the minute part
+
+# Load the stored ETags of previously downloaded files
+def load_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+# Download a single file, returning its ETag and whether the file on disk was replaced
+def _download(session, url, output_path, etag=None):
+    file_name = os.path.basename(output_path)
+    # Stream to a temporary file so a failed transfer never replaces a good .h5
+    temp_path = output_path + ".part"
+    try:
+        print(f"Downloading {file_name}...")
+        headers = {'If-None-Match': etag} if etag else {}
+        # Closing the response hands its connection back to the pool, even when the body is never read
+        with session.get(url, stream=True, headers=headers, timeout=60) as response:
+            if response.status_code == 304:
+                print(f"File {file_name} is unchanged, skipping download.")
+                return etag, False
+            response.raise_for_status()
+
+            # Let urllib3 undo any Content-Encoding, since we bypass iter_content
+            response.raw.decode_content = True
+            with open(temp_path, 'wb') as f:
+                shutil.copyfileobj(response.raw, f, length=1 << 20)
+        os.replace(temp_path, output_path)
+        print(f"Downloaded file to: {output_path}")
+        return response.headers.get('ETag'), True
+    except Exception as e:
+        print(f"Error downloading file: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        # Any existing file is untouched, so keep its ETag for the next revalidation
+        return etag, False
+
+# Delete a file that was not part of the fetch
+def _remove_file(output_folder, file):
+    try:
+        os.remove(os.path.join(output_folder, file))
+        print(f"Deleted file: {file}")
+    except Exception as e:
+        print(f"Error deleting file: {e}")
 
 # Download HDF5 files
 def download_hdf5_files(data, output_folder):
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
-    fetched_files = set()
+    meta_path = os.path.join(output_folder, meta_file_name)
+    meta = load_meta(meta_path)
+
+    fetched_files = {meta_file_name}
+    candidates = []
     for feature in data['features']:
         file_datetime = feature['properties']['datetime']
         if should_skip_file(file_datetime):
@@ -90,34 +154,45 @@ def download_hdf5_files(data, output_folder):
         sanitized_file_name = sanitize_filename(file_name)
         output_path = os.path.join(output_folder, sanitized_file_name)
         fetched_files.add(sanitized_file_name)
+        candidates.append((sanitized_file_name, feature['asset']['data']['href'], output_path))
 
-        # Check if the file already exists
-        if os.path.exists(output_path):
+    # Names sort chronologically, so these are the frames DMI may still update
+    recent_files = set(sorted(name for name, _, _ in candidates)[-revalidate_latest:])
+
+    tasks = []
+    for sanitized_file_name, hdf5_url, output_path in candidates:
+        # Existing files are only revalidated when they are recent and we know their ETag
+        file_exists = os.path.exists(output_path)
+        etag = meta.get(sanitized_file_name) if file_exists else None
+        if file_exists and (etag is None or sanitized_file_name not in recent_files):
             print(f"File {sanitized_file_name} already exists, skipping download.")
             continue
 
-        hdf5_url = feature['asset']['data']['href']
-        try:
-            print(f"Downloading {sanitized_file_name}...")
-            response = requests.get(hdf5_url, stream=True)
-            response.raise_for_status()
-
-            with open(output_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            print(f"Downloaded file to: {output_path}")
-        except Exception as e:
-            print(f"Error downloading file: {e}")
+        tasks.append((hdf5_url, output_path, etag))
+
+    # Download the missing files concurrently over pooled connections
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda task: _download(session, *task), tasks))
+
+    for (_, output_path, old_etag), (etag, replaced) in zip(tasks, results):
+        file_name = os.path.basename(output_path)
+        meta[file_name] = etag
+        # A revalidated file that changed must be rendered again, so drop its stale PNG
+        png_file = os.path.splitext(file_name)[0] + ".png"
+        if old_etag is not None and replaced and os.path.exists(os.path.join(png_output_folder, png_file)):
+            _remove_file(png_output_folder, png_file)
+    meta = {name: etag for name, etag in meta.items() if name in fetched_files and etag}
+    # Write to a temporary file first so a crash never leaves a truncated .meta.json
+    temp_meta_path = meta_path + ".tmp"
+    with open(temp_meta_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(temp_meta_path, meta_path)
 
     # Delete files that were not part of the fetch
-    existing_files = set(os.listdir(output_folder))
+    existing_files = {e.name for e in os.scandir(output_folder)}
     files_to_delete = existing_files - fetched_files
-    for file in files_to_delete:
-        try:
-            os.remove(os.path.join(output_folder, file))
-            print(f"Deleted file: {file}")
-        except Exception as e:
-            print(f"Error deleting file: {e}")
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda file: _remove_file(output_folder, file), files_to_delete))
 
 def main():
     if not check_internet_connection():
@@ -1,13 +1,13 @@
-import h5py
+import io
 import numpy as np
 import os
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
 import cv2
 from PIL import Image, ImageDraw, ImageFont
-from datetime import datetime, timedelta
-import pytz
-import matplotlib.pyplot as plt
-from matplotlib.colors import Normalize, ListedColormap
+from datetime import datetime, timezone, timedelta
+from zoneinfo import ZoneInfo
 
 # Configure logging
 logging.basicConfig(
@@ -21,30 +21,32 @@ h5_output_folder = "h5_files"
 forecast_folder = "forecast_files"
 REFLECTIVITY_THRESHOLD = 0
 
+# Load the timestamp font once instead of for every image
+try:
+    _FONT = ImageFont.truetype("arial.ttf", 20)
+except IOError:
+    _FONT = ImageFont.load_default()
+
 # Function to add timestamp to an image
 def add_timestamp(image, timestamp, text="Prognose"):
     draw = ImageDraw.Draw(image)
-    font_size = 20
-    try:
-        font = ImageFont.truetype("arial.ttf", font_size)
-    except IOError:
-        font = ImageFont.load_default()
     timestamp_text = timestamp.strftime('%d. %B %Y - %H:%M')
-    text_bbox = draw.textbbox((0, 0), timestamp_text, font=font)
+    text_bbox = draw.textbbox((0, 0), timestamp_text, font=_FONT)
     text_width = text_bbox[2] - text_bbox[0]
     text_height = text_bbox[3] - text_bbox[1]
     width, height = image.size
     x = width - text_width - 10
     y = 10
-    draw.text((x, y), timestamp_text, font=font, fill="black")
-    draw.text((x, y + text_height + 5), text, font=font, fill="black")
+    draw.text((x, y), timestamp_text, font=_FONT, fill="black")
+    draw.text((x, y + text_height + 5), text, font=_FONT, fill="black")
     return image
 
+# Danish time zone, looked up once
+danish_tz = ZoneInfo('Europe/Copenhagen')
+
 # Function to convert UTC to Danish time
 def convert_utc_to_danish(utc_time):
-    utc = pytz.utc
-    danish_tz = pytz.timezone('Europe/Copenhagen')
-    utc_dt = utc.localize(utc_time)
+    utc_dt = utc_time.replace(tzinfo=timezone.utc)
     danish_dt = utc_dt.astimezone(danish_tz)
     return danish_dt
 
@@ -61,15 +63,90 @@ colors = [
 ]
 # Define the range for 8-bit values
 dbz_values = [0, 32, 64, 96, 128, 160, 192, 224, 255]
-cmap = ListedColormap(colors)
-norm = Normalize(vmin=min(dbz_values), vmax=max(dbz_values))
+
+# Precompute the RGBA color for every possible 8-bit value so a frame can be
+# colored with a single lookup. Each value falls into one of the equally wide
+# color bins between the lowest and highest dBZ value, like a ListedColormap.
+palette = np.array([c if len(c) == 4 else c + (1.0,) for c in colors])
+vmin, vmax = min(dbz_values), max(dbz_values)
+bins = np.minimum((np.arange(256) - vmin) * len(colors) // (vmax - vmin), len(colors) - 1)
+LUT = (palette[bins] * 255).astype(np.uint8)
+LUT[:, 3] = 255
+LUT[0] = (0, 0, 0, 0)  # Transparent for 0 values
+LUT[255] = (0, 0, 0, 0)  # 255 marks missing data
 
 # Function to perform linear interpolation
+# Blends straight into uint8 instead of promoting the frames to float64;
+# OpenCV rounds and saturates, so the result can index the LUT directly
 def interpolate_data(data1, data2, alpha):
-    return (1 - alpha) * data1 + alpha * data2
+    return cv2.addWeighted(data1, 1 - alpha, data2, alpha, 0, dtype=cv2.CV_8U)
+
+# Blend two frames and color the result, optionally into a preallocated RGBA buffer
+def blend_and_lut(data1, data2, alpha, out=None):
+    forecast_data = interpolate_data(data1, data2, alpha)
+    # 0 and 255 are transparent in the lookup table
+    return np.take(LUT, forecast_data, axis=0, out=out)
+
+# Encode a PNG in memory and write it with a single raw file write
+def _write_png(path, image):
+    buf = io.BytesIO()
+    image.save(buf, format="PNG", compress_level=1, optimize=False)
+    data = buf.getbuffer()
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+# The two frames being blended, handed to each worker once instead of with every step,
+# plus the RGBA buffer and writable image each worker renders its steps into
+_frames = None
+_rgba = None
+_image = None
+
+def _init_frames(data1, data2):
+    global _frames, _rgba, _image
+    _frames = (data1, data2)
+    _rgba = np.empty(data1.shape + (4,), dtype=np.uint8)
+    _image = Image.new('RGBA', (data1.shape[1], data1.shape[0]))
+
+# Render a single forecast step and return its file name
+def _forecast_step(i, latest_file_timestamp, forecast_folder):
+    alpha = (i + 1) / 6
+    blend_and_lut(*_frames, alpha, out=_rgba)
+    logging.debug(f"Interpolated data for forecast step {i+1} with alpha {alpha}")
+
+    # Copy the colored step into the worker's own image. Unlike a read-only
+    # Image.fromarray view, drawing the timestamp on it does not copy the image again.
+    _image.frombytes(_rgba)
+    forecast_image = _image
+
+    forecast_time = convert_utc_to_danish(latest_file_timestamp + timedelta(minutes=10 * (i + 1)))
+    forecast_image = add_timestamp(forecast_image, forecast_time)
+
+    file_name = forecast_time.strftime('%Y-%m-%dT%H-%M-%SZ')
+
+    png_path = os.path.join(forecast_folder, file_name + ".png")
+    _write_png(png_path, forecast_image)
+    print(f"Saved forecast PNG file: {png_path}")
+    logging.debug(f"Saved forecast PNG file: {png_path}")
+    return file_name
+
+# Delete a stale forecast PNG file
+def _remove_png(forecast_folder, forecast_file):
+    try:
+        os.remove(os.path.join(forecast_folder, forecast_file + ".png"))
+        print(f"Deleted forecast PNG file: {forecast_file}.png")
+        logging.debug(f"Deleted forecast PNG file: {forecast_file}.png")
+    except Exception as e:
+        logging.error(f"Error deleting file: {e}")
+        print(f"Error deleting file: {e}")
 
 # Generate forecast images based on the latest HDF5 files
 def generate_forecast(hdf5_files, forecast_folder):
+    import h5py  # Imported lazily so the other scripts don't pay for it
+
     logging.debug("Starting generate_forecast function")
     if not os.path.exists(forecast_folder):
         os.makedirs(forecast_folder)
@@ -81,10 +158,8 @@ def generate_forecast(hdf5_files, forecast_folder):
 
     for file_path in latest_files:
         try:
-            with h5py.File(file_path, 'r') as file:
-                data = file['dataset1']['data1']['data'][:]
-                data[data == 255] = 0  # Replace 255 values with 0
-                data[data < REFLECTIVITY_THRESHOLD] = 0
+            with h5py.File(file_path, 'r', rdcc_nbytes=4 << 20) as file:
+                data = file['dataset1/data1/data'][:]
                 datasets.append(data)
                 logging.debug(f"Read data from {file_path} with shape {data.shape}")
         except Exception as e:
@@ -94,54 +169,30 @@ def generate_forecast(hdf5_files, forecast_folder):
         logging.error("Not enough data files to generate forecast.")
         return
 
+    # Only the two latest frames are blended, so mask just those once
+    for data in datasets[-2:]:
+        data[data == 255] = 0  # Replace 255 values with 0
+        data[data < REFLECTIVITY_THRESHOLD] = 0
+
     # Use the timestamp from the latest HDF5 file
     latest_file_timestamp = datetime.strptime(os.path.basename(latest_files[-1]), '%Y-%m-%dT%H-%M-%SZ.h5')
 
     # Generate forecast images
-    existing_forecast_files = {os.path.splitext(f)[0] for f in os.listdir(forecast_folder) if f.endswith('.png')}
-    new_forecast_files = set()
-
-    for i in range(6):  # Generate 6 forecast images
-        alpha = (i + 1) / 6
-        forecast_data = interpolate_data(datasets[-2], datasets[-1], alpha)
-        logging.debug(f"Interpolated data for forecast step {i+1} with alpha {alpha}")
-
-        # Explicitly set all 255 values to 0 to ensure transparency
-        forecast_data[forecast_data == 255] = 0
-
-        # Create a normalized color map with custom colors
-        mapped_data = cmap(norm(forecast_data))
-
-        rgba_data = (mapped_data * 255).astype(np.uint8)
-        rgba_data[..., 3] = np.where(forecast_data == 0, 0, 255)
-
-        forecast_image = Image.fromarray(rgba_data, 'RGBA')
-
-        forecast_time = convert_utc_to_danish(latest_file_timestamp + timedelta(minutes=10 * (i + 1)))
-        forecast_image = add_timestamp(forecast_image, forecast_time)
-
-        file_name = forecast_time.strftime('%Y-%m-%dT%H-%M-%SZ')
-        new_forecast_files.add(file_name)
+    existing_forecast_files = {e.name[:-4] for e in os.scandir(forecast_folder) if e.name.endswith('.png')}
 
-        png_path = os.path.join(forecast_folder, file_name + ".png")
-        forecast_image.save(png_path)
-        print(f"Saved forecast PNG file: {png_path}")
-        logging.debug(f"Saved forecast PNG file: {png_path}")
+    # Each forecast step is independent, so render them in parallel
+    steps = [(i, latest_file_timestamp, forecast_folder) for i in range(6)]
+    with Pool(processes=min(os.cpu_count(), len(steps)), initializer=_init_frames, initargs=(datasets[-2], datasets[-1])) as pool:
+        new_forecast_files = set(pool.starmap(_forecast_step, steps))
 
     # Delete forecast PNG files that do not match the generated ones
-    for forecast_file in existing_forecast_files:
-        if forecast_file not in new_forecast_files:
-            try:
-                os.remove(os.path.join(forecast_folder, forecast_file + ".png"))
-                print(f"Deleted forecast PNG file: {forecast_file}.png")
-                logging.debug(f"Deleted forecast PNG file: {forecast_file}.png")
-            except Exception as e:
-                logging.error(f"Error deleting file: {e}")
-                print(f"Error deleting file: {e}")
+    stale = existing_forecast_files - new_forecast_files
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda forecast_file: _remove_png(forecast_folder, forecast_file), stale))
 
 def main():
     logging.debug("Starting main function")
-    hdf5_files = [os.path.join(h5_output_folder, file) for file in os.listdir(h5_output_folder) if file.endswith('.h5')]
+    hdf5_files = [e.path for e in os.scandir(h5_output_folder) if e.name.endswith('.h5')]
     if hdf5_files:
         logging.debug(f"Found HDF5 files: {hdf5_files}")
         generate_forecast(hdf5_files, forecast_folder)
@@ -1,6 +1,8 @@
 import os
+import re
 import boto3
-from datetime import datetime
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -24,31 +26,41 @@ s3_client = boto3.client(
     aws_access_key_id=AWS_ACCESS_KEY,
     aws_secret_access_key=AWS_SECRET_KEY,
     region_name=REGION_NAME,
-    endpoint_url=ENDPOINT_URL  # Add custom endpoint URL here
+    endpoint_url=ENDPOINT_URL,  # Add custom endpoint URL here
+    # Room for the concurrent uploads to share one connection pool
+    config=Config(max_pool_connections=32, retries={'max_attempts': 3})
 )
 
-# Function to extract timestamp from filename
-def extract_timestamp(filename):
-    try:
-        # Assuming the filename is in the format 'YYYY-MM-DDTHH-MM-SSZ.png'
-        timestamp_str = filename.split('.')[0]
-        return datetime.strptime(timestamp_str, '%Y-%m-%dT%H-%M-%SZ')
-    except ValueError as e:
-        print(f"Error parsing timestamp from filename {filename}: {e}")
-        return None
+# Names in the 'YYYY-MM-DDTHH-MM-SSZ.png' format, checked without parsing the timestamp
+_TIMESTAMP_NAME = re.compile(r'\d{4}-\d\d-\d\dT\d\d-\d\d-\d\dZ\.png', re.ASCII)
+
+# Function to upload a single file
+def upload_file(file_path, s3_key):
+    s3_client.upload_file(file_path, BUCKET_NAME, s3_key, ExtraArgs={'ACL': 'public-read'})
+    print(f"Uploaded {file_path} as {s3_key} to S3.")
 
 # Function to upload and rename files
 def upload_and_rename_files(folder, start_index, subfolder):
-    files = [f for f in os.listdir(folder) if f.endswith('.png')]
-    # Sort files by timestamp extracted from filename
-    files.sort(key=lambda x: extract_timestamp(x))
+    # Only upload timestamp-named files, so stray files never take a numbered slot
+    files = []
+    for f in os.listdir(folder):
+        if _TIMESTAMP_NAME.fullmatch(f):
+            files.append(f)
+        elif f.endswith('.png'):
+            print(f"Skipping {f}, its name is not a 'YYYY-MM-DDTHH-MM-SSZ' timestamp.")
+    # Sort files by timestamp; 'YYYY-MM-DDTHH-MM-SSZ' names sort chronologically as plain strings
+    files.sort()
     
+    uploads = []
     for idx, filename in enumerate(files):
         file_path = os.path.join(folder, filename)
         new_file_name = f"{start_index + idx}.png"
         s3_key = os.path.join(subfolder, new_file_name)
-        s3_client.upload_file(file_path, BUCKET_NAME, s3_key, ExtraArgs={'ACL': 'public-read'})
-        print(f"Uploaded {file_path} as {s3_key} to S3.")
+        uploads.append((file_path, s3_key))
+
+    # Uploads are network bound, so threads are enough to overlap them
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        list(executor.map(lambda upload: upload_file(*upload), uploads))
 
 def main():
     print("Uploading PNG files...")
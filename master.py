@@ -1,18 +1,32 @@
 import os
 import re
+import json
+import hashlib
+import shutil
+import socket
 import requests
 import logging
 import h5py
 import numpy as np
 import boto3
+from boto3.s3.transfer import S3Transfer, TransferConfig
+from botocore.config import Config
 import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 from PIL import Image, ImageDraw, ImageFont
-import pytz
+from zoneinfo import ZoneInfo
 import matplotlib.pyplot as plt
 from matplotlib.colors import Normalize, ListedColormap
-from sklearn.linear_model import LinearRegression
+
+# orjson parses the API's feature collections several times faster; fall back to the stdlib without it
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
 
 # Load environment variables
 load_dotenv()
@@ -40,6 +54,12 @@ REGION_NAME = os.getenv('AWS_REGION')
 ENDPOINT_URL = os.getenv('AWS_ENDPOINT_URL')
 SUBFOLDER = os.getenv('SUBFOLDER')
 REFLECTIVITY_THRESHOLD = 70
+DOWNLOAD_WORKERS = 8
+UPLOAD_WORKERS = 16
+CYCLE_SECONDS = 300
+UPLOAD_MANIFEST = "upload_manifest.json"
+DANISH_TZ = ZoneInfo('Europe/Copenhagen')
+SKIPPED_MINUTES = frozenset(('05', '15', '25', '35', '45', '55'))
 
 # AWS S3 Client
 s3_client = boto3.client(
@@ -47,8 +67,20 @@ s3_client = boto3.client(
     aws_access_key_id=AWS_ACCESS_KEY,
     aws_secret_access_key=AWS_SECRET_KEY,
     region_name=REGION_NAME,
-    endpoint_url=ENDPOINT_URL
+    endpoint_url=ENDPOINT_URL,
+    config=Config(max_pool_connections=32)
 )
+transfer = S3Transfer(s3_client, TransferConfig(multipart_threshold=8 * 1024 * 1024, max_concurrency=UPLOAD_WORKERS))
+
+# HTTP session shared by the API calls and the parallel downloads
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16))
+
+# Forecast statistics per HDF5 file name, filled while converting so frames are not read twice
+frame_stats = {}
+
+# ETag of the last radar data response, for conditional API requests
+last_api_etag = None
 
 # Define the colors based on dBZ values
 colors = [
@@ -66,6 +98,17 @@ dbz_values = [70, 85, 100, 128, 160, 192, 255]
 cmap = ListedColormap(colors)
 norm = Normalize(vmin=70, vmax=255)
 
+# RGBA color for every possible 8-bit reflectivity value, so a frame is colored with a single lookup.
+# Values below the threshold and the 255 "no data" marker are fully transparent.
+RGBA_LUT = (cmap(np.clip((np.arange(256) - REFLECTIVITY_THRESHOLD) / (255 - REFLECTIVITY_THRESHOLD), 0, 1)) * 255).astype(np.uint8)
+RGBA_LUT[:REFLECTIVITY_THRESHOLD] = 0
+RGBA_LUT[255] = 0
+
+# Same masking for the raw values: one gather zeroes values below the threshold and the 255 marker
+REFLECTIVITY_LUT = np.arange(256, dtype=np.uint8)
+REFLECTIVITY_LUT[:REFLECTIVITY_THRESHOLD] = 0
+REFLECTIVITY_LUT[255] = 0
+
 months_translation = {
     "January": "januar",
     "February": "februar",
@@ -81,59 +124,86 @@ months_translation = {
     "December": "december"
 }
 
+# Timestamp font, loaded once instead of for every frame
+try:
+    _FONT = ImageFont.truetype("static/TV2.ttf", 45)
+except IOError:
+    _FONT = ImageFont.load_default()
+
+# Matches any English month name, so all of them are translated in a single scan
+_MONTH_RE = re.compile('|'.join(re.escape(month) for month in months_translation))
+
+# Characters that are not allowed in filenames, removed with a single str.translate
+_SANITIZE_TABLE = str.maketrans('', '', '\\/:*?"<>|')
+
 # Utility Functions
-def check_internet_connection():
+def check_internet_connection(timeout=1.5):
+    # A bare TCP handshake with a public DNS server is enough to tell if we are online
     try:
-        requests.get("http://www.google.com", timeout=5)
-        return True
-    except requests.ConnectionError:
+        with socket.create_connection(("1.1.1.1", 53), timeout=timeout):
+            return True
+    except OSError:
         logging.warning("No internet connection available.")
         return False
 
 def sanitize_filename(filename):
-    return re.sub(r'[\\/:*?"<>|]', '', filename)
+    return filename.translate(_SANITIZE_TABLE)
 
 def get_current_utc_time():
     return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
 
 def convert_utc_to_danish(utc_time):
-    utc = pytz.utc
-    danish_tz = pytz.timezone('Europe/Copenhagen')
-    return utc.localize(utc_time).astimezone(danish_tz)
+    return utc_time.replace(tzinfo=timezone.utc).astimezone(DANISH_TZ)
 
 def translate_month_to_danish(date_str):
-    for eng_month, dan_month in months_translation.items():
-        date_str = date_str.replace(eng_month, dan_month)
-    return date_str
+    return _MONTH_RE.sub(lambda match: months_translation[match.group(0)], date_str)
 
 def add_timestamp(image, timestamp, is_forecast=False):
     draw = ImageDraw.Draw(image)
-    font_size = 45
-    try:
-        font = ImageFont.truetype("static/TV2.ttf", font_size)
-    except IOError:
-        font = ImageFont.load_default()
     timestamp_text = timestamp.strftime('%d. %B %Y - %H:%M')
     timestamp_text = translate_month_to_danish(timestamp_text)
     text = "Prognose" if is_forecast else ""
     full_text = f"{timestamp_text}\n{text}" if text else timestamp_text
-    text_bbox = draw.textbbox((0, 0), full_text, font=font)
+    text_bbox = draw.textbbox((0, 0), full_text, font=_FONT)
     text_width = text_bbox[2] - text_bbox[0]
     text_height = text_bbox[3] - text_bbox[1]
     margin = 10
     x = margin
     y = image.size[1] - text_height - margin
-    draw.text((x, y), full_text, font=font, fill="black")
+    draw.text((x, y), full_text, font=_FONT, fill="black")
     return image
 
+def snapshot(folder):
+    # One directory scan, reused for listing and existence checks
+    return {entry.name: entry for entry in os.scandir(folder)}
+
 def extract_timestamp(filename):
     try:
-        timestamp_str = filename.split('.')[0]
-        return datetime.strptime(timestamp_str, '%Y-%m-%dT%H-%M-%SZ')
+        ts = filename.split('.')[0]
+        # Fixed 'YYYY-MM-DDTHH-MM-SSZ' layout, sliced directly instead of going through strptime.
+        # Positions 4, 7, 10, 13, 16 and 19 hold the separators, and every field must be plain digits.
+        if len(ts) != 20 or ts[4::3] != '--T--Z':
+            raise ValueError(f"unexpected timestamp format {ts!r}")
+        fields = (ts[0:4], ts[5:7], ts[8:10], ts[11:13], ts[14:16], ts[17:19])
+        if not all(field.isascii() and field.isdigit() for field in fields):
+            raise ValueError(f"unexpected timestamp format {ts!r}")
+        return datetime(*map(int, fields))
     except ValueError as e:
         logging.error(f"Error parsing timestamp from filename {filename}: {e}")
         return None
 
+def output_size(shape):
+    # Frames are scaled to 1280 pixels in width, keeping the aspect ratio
+    height, width = shape
+    return 1280, int(height * (1280 / width))
+
+def render_radar_image(data):
+    # Color the frame and resize it. Frames at least twice as wide as the output
+    # are subsampled first, so the colormap and resize only touch the pixels that survive.
+    step = max(1, data.shape[1] // 1280)
+    image = Image.fromarray(RGBA_LUT[data[::step, ::step]], 'RGBA')
+    return image.resize(output_size(data.shape), Image.Resampling.BILINEAR)
+
 # Download HDF5 Files
 def fetch_latest_radar_data():
     try:
@@ -144,26 +214,52 @@ def fetch_latest_radar_data():
             'datetime': f"../{current_utc_time}",
             'bbox': BBOX
         }
-        response = requests.get(API_URL, params=params)
+        # Ask the API to answer 304 when the feature list has not changed since the last cycle
+        headers = {'If-None-Match': last_api_etag} if last_api_etag else {}
+        response = session.get(API_URL, params=params, headers=headers)
+        if response.status_code == 304:
+            print("Radar data unchanged since last fetch.")
+            return None, None
         response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
+        # The ETag is only remembered once the files it describes are downloaded
+        return json_loads(response.content), response.headers.get('ETag')
+    except (requests.RequestException, ValueError) as e:
         logging.error(f"Error fetching radar data: {e}")
-        return None
+        return None, None
 
 def should_skip_file(file_datetime):
-    return int(file_datetime[14:16]) % 10 == 5
+    return file_datetime[14:16] in SKIPPED_MINUTES
+
+def _download_one(session, feature, output_path):
+    # Stream to a temporary file so a failed download never leaves a partial .h5 behind
+    temp_path = output_path + ".part"
+    try:
+        with session.get(feature['asset']['data']['href'], stream=True, timeout=60) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            with open(temp_path, 'wb') as f:
+                shutil.copyfileobj(response.raw, f, length=1 << 20)
+        os.replace(temp_path, output_path)
+        return True
+    except Exception as e:
+        logging.error(f"Error downloading file: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
 
 def download_hdf5_files():
+    global last_api_etag
     print("Starting download of HDF5 files...")
-    data = fetch_latest_radar_data()
+    data, etag = fetch_latest_radar_data()
     if data is None:
         return
 
     if not os.path.exists(H5_OUTPUT_FOLDER):
         os.makedirs(H5_OUTPUT_FOLDER)
 
+    existing_files = snapshot(H5_OUTPUT_FOLDER)
     fetched_files = set()
+    downloads = []
     for feature in data['features']:
         file_datetime = feature['properties']['datetime']
         if should_skip_file(file_datetime):
@@ -175,21 +271,21 @@ def download_hdf5_files():
         output_path = os.path.join(H5_OUTPUT_FOLDER, sanitized_file_name)
         fetched_files.add(sanitized_file_name)
 
-        if os.path.exists(output_path):
+        if sanitized_file_name in existing_files:
             continue
 
-        hdf5_url = feature['asset']['data']['href']
-        try:
-            response = requests.get(hdf5_url, stream=True)
-            response.raise_for_status()
-            with open(output_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        except Exception as e:
-            logging.error(f"Error downloading file: {e}")
+        downloads.append((feature, output_path))
+
+    # In steady state only one or two frames are new, so size the pool to the work
+    succeeded = True
+    if downloads:
+        with ThreadPoolExecutor(max_workers=min(DOWNLOAD_WORKERS, len(downloads))) as executor:
+            succeeded = all(list(executor.map(lambda job: _download_one(session, *job), downloads)))
 
-    existing_files = set(os.listdir(H5_OUTPUT_FOLDER))
-    for file in existing_files - fetched_files:
+    # Any failed download clears the ETag so the next cycle refetches the list and retries it
+    last_api_etag = etag if succeeded else None
+
+    for file in existing_files.keys() - fetched_files:
         try:
             os.remove(os.path.join(H5_OUTPUT_FOLDER, file))
         except Exception as e:
@@ -202,8 +298,8 @@ def convert_hdf5_to_png():
     if not os.path.exists(PNG_OUTPUT_FOLDER):
         os.makedirs(PNG_OUTPUT_FOLDER)
 
-    hdf5_files = [os.path.join(H5_OUTPUT_FOLDER, file) for file in os.listdir(H5_OUTPUT_FOLDER) if file.endswith('.h5')]
-    existing_png_files = {os.path.splitext(f)[0] for f in os.listdir(PNG_OUTPUT_FOLDER) if f.endswith('.png')}
+    hdf5_files = [entry.path for name, entry in snapshot(H5_OUTPUT_FOLDER).items() if name.endswith('.h5')]
+    existing_png_files = {name[:-4] for name in snapshot(PNG_OUTPUT_FOLDER) if name.endswith('.png')}
     new_png_files = set()
 
     for file_path in hdf5_files:
@@ -215,45 +311,18 @@ def convert_hdf5_to_png():
 
         try:
             with h5py.File(file_path, 'r') as file:
-                data = file['dataset1']['data1']['data'][:]
-                data[data < REFLECTIVITY_THRESHOLD] = 0  # Remove values below threshold
-                data[data == 255] = 0  # Remove 255 values
-
-                # Normalize and map data to colormap
-                norm_data = np.clip((data - REFLECTIVITY_THRESHOLD) / (255 - REFLECTIVITY_THRESHOLD), 0, 1)
-                mapped_data = cmap(norm_data)
-                rgba_data = (mapped_data * 255).astype(np.uint8)
-                rgba_data[..., 3] = np.where(data == 0, 0, 204)  # Set transparency for 0 values, 204 for 0.8 alpha
+                data = read_radar_dataset(file)
+                frame_stats[os.path.basename(file_path)] = frame_statistics(REFLECTIVITY_LUT[data])
+                radar_image = render_radar_image(data)
 
-                radar_image = Image.fromarray(rgba_data, 'RGBA')
-
-                # Resize the image to 1280 pixels in width
-                width, height = radar_image.size
-                new_height = int(height * (1280 / width))
-                radar_image = radar_image.resize((1280, new_height), Image.Resampling.LANCZOS)
-                
-                # Debug: Print image size after resizing
-                print(f"Resized image size: {radar_image.size}")
-
-                try:
-                    utc_time = datetime.strptime(file_name_without_ext, '%Y-%m-%dT%H-%M-%SZ')
-                    danish_time = convert_utc_to_danish(utc_time)
-                    radar_image = add_timestamp(radar_image, danish_time)
-                except ValueError as e:
-                    logging.error(f"Error parsing timestamp: {e}")
+                # extract_timestamp logs names it cannot parse, and those frames are saved without a timestamp
+                utc_time = extract_timestamp(file_name_without_ext)
+                if utc_time is not None:
+                    radar_image = add_timestamp(radar_image, convert_utc_to_danish(utc_time))
 
                 png_path = os.path.join(PNG_OUTPUT_FOLDER, file_name_without_ext + ".png")
-                
-                # Debug: Print file path before saving
-                print(f"Saving PNG file to: {png_path}")
-                
-                radar_image.save(png_path)
-                
-                # Debug: Confirm file is saved
-                if os.path.exists(png_path):
-                    print(f"File saved successfully: {png_path}")
-                else:
-                    print(f"Failed to save file: {png_path}")
+                radar_image.save(png_path, "PNG", optimize=False, compress_level=1)
+                logging.debug("Saved PNG file: %s", png_path)
         except FileNotFoundError as e:
             logging.error(f"File not found error: {e}")
         except Exception as e:
@@ -268,22 +337,32 @@ def convert_hdf5_to_png():
     print("Completed conversion of HDF5 to PNG.")
 
 # Generate Forecast Images using Linear Regression
+def read_radar_dataset(file):
+    dset = file['dataset1']['data1']['data']
+    # A dataset stored as one chunk whose only filter is DEFLATE is inflated directly, bypassing HDF5's filter pipeline
+    if (dset.chunks == dset.shape and dset.compression == 'gzip'
+            and dset.id.get_create_plist().get_nfilters() == 1):
+        filter_mask, chunk = dset.id.read_direct_chunk((0,) * dset.ndim)
+        if filter_mask == 0:
+            return np.frombuffer(bytearray(zlib.decompress(chunk)), dtype=dset.dtype).reshape(dset.shape)
+    return dset[:]
+
 def read_hdf5_data(file_path):
     with h5py.File(file_path, 'r') as file:
-        data = file['dataset1']['data1']['data'][:]
-        data[data == 255] = 0
-        data[data < REFLECTIVITY_THRESHOLD] = 0
-    return data
+        return REFLECTIVITY_LUT[read_radar_dataset(file)]
+
+def frame_statistics(data):
+    # What the forecast needs from a masked frame: its mean reflectivity and its shape
+    # An exact integer sum is cheaper than np.mean's float accumulation over uint8 data
+    return float(data.sum(dtype=np.uint64)) / data.size, data.shape
 
 def generate_linear_forecast(datasets):
-    X = np.arange(len(datasets)).reshape(-1, 1)
+    n = len(datasets)
     y = np.array(datasets)
-    
-    model = LinearRegression()
-    model.fit(X, y)
-    
-    X_forecast = np.arange(len(datasets), len(datasets) + 6).reshape(-1, 1)
-    forecast = model.predict(X_forecast)
+
+    # Least-squares line through the samples; same fit as LinearRegression without the sklearn overhead
+    slope, intercept = np.polyfit(np.arange(n), y, 1)
+    forecast = slope * np.arange(n, n + 6) + intercept
     
     # Clip forecast values to ensure they are within a realistic range
     forecast = np.clip(forecast, np.min(y), np.max(y))
@@ -295,39 +374,50 @@ def save_forecast_to_hdf5(forecast, base_file_name, data_shape):
         os.makedirs(FORECAST_H5_FOLDER)
 
     for i, forecast_value in enumerate(forecast):
-        forecast_data = np.full(data_shape, forecast_value)
-        forecast_data[forecast_data < REFLECTIVITY_THRESHOLD] = 0
+        fill_value = int(forecast_value) if forecast_value >= REFLECTIVITY_THRESHOLD else 0
         
         file_name = f"{base_file_name}_forecast_{i+1}.h5"
         file_path = os.path.join(FORECAST_H5_FOLDER, file_name)
         
+        # Every pixel holds the same value, so store it as the fill value and write no data blocks
         with h5py.File(file_path, 'w') as h5file:
-            dataset = h5file.create_dataset('dataset1/data1/data', data=forecast_data)
+            dataset = h5file.create_dataset('dataset1/data1/data', shape=data_shape, dtype='u1', fillvalue=fill_value)
             
-        print(f"Saved forecast data to {file_path}")
+        logging.debug("Saved forecast data to %s", file_path)
 
 def generate_forecast():
     print("Starting generation of forecast images...")
     if not os.path.exists(FORECAST_FOLDER):
         os.makedirs(FORECAST_FOLDER)
 
-    hdf5_files = [os.path.join(H5_OUTPUT_FOLDER, file) for file in os.listdir(H5_OUTPUT_FOLDER) if file.endswith('.h5')]
-    hdf5_files.sort()
+    hdf5_files = [os.path.join(H5_OUTPUT_FOLDER, name) for name in sorted(snapshot(H5_OUTPUT_FOLDER)) if name.endswith('.h5')]
     latest_files = hdf5_files[-10:]
 
     if len(latest_files) < 10:
         logging.error("Not enough data files to generate forecast.")
         return
 
+    # Frames converted in this process already have their statistics cached; only read the rest
+    current_names = {os.path.basename(file_path) for file_path in hdf5_files}
+    for name in frame_stats.keys() - current_names:
+        del frame_stats[name]
+
+    # Each missing frame is reduced to its statistics as soon as it is read, so at most one array per worker is alive
+    missing = [file_path for file_path in latest_files if os.path.basename(file_path) not in frame_stats]
+    if missing:
+        with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+            for file_path, stats in zip(missing, executor.map(lambda path: frame_statistics(read_hdf5_data(path)), missing)):
+                frame_stats[os.path.basename(file_path)] = stats
+
     datasets = []
     for file_path in latest_files:
-        data = read_hdf5_data(file_path)
-        datasets.append(np.mean(data))  # Simplified: using mean reflectivity for demonstration
+        mean, shape = frame_stats[os.path.basename(file_path)]
+        datasets.append(mean)  # Simplified: using mean reflectivity for demonstration
 
     forecast = generate_linear_forecast(datasets)
 
     base_file_name = os.path.basename(latest_files[-1]).split('.')[0]
-    save_forecast_to_hdf5(forecast, base_file_name, data.shape)
+    save_forecast_to_hdf5(forecast, base_file_name, shape)
 
     convert_forecast_hdf5_to_png()
 
@@ -336,10 +426,9 @@ def convert_forecast_hdf5_to_png():
     if not os.path.exists(FORECAST_FOLDER):
         os.makedirs(FORECAST_FOLDER)
 
-    forecast_hdf5_files = [os.path.join(FORECAST_H5_FOLDER, file) for file in os.listdir(FORECAST_H5_FOLDER) if file.endswith('.h5')]
-    forecast_hdf5_files.sort()
+    forecast_hdf5_files = [os.path.join(FORECAST_H5_FOLDER, name) for name in sorted(snapshot(FORECAST_H5_FOLDER)) if name.endswith('.h5')]
 
-    existing_forecast_files = {os.path.splitext(f)[0] for f in os.listdir(FORECAST_FOLDER) if f.endswith('.png')}
+    existing_forecast_files = {name[:-4] for name in snapshot(FORECAST_FOLDER) if name.endswith('.png')}
     new_forecast_files = set()
 
     for file_path in forecast_hdf5_files:
@@ -349,24 +438,18 @@ def convert_forecast_hdf5_to_png():
         try:
             with h5py.File(file_path, 'r') as file:
                 data = file['dataset1']['data1']['data'][:]
-                data[data == 255] = 0  # Remove 255 values
-
-                # Debugging output for checking data values
-                print(f"Forecast data from {file_path}:")
-                print(f"Min value: {np.min(data)}, Max value: {np.max(data)}")
 
-                # Normalize and map data to colormap
-                norm_data = np.clip((data - REFLECTIVITY_THRESHOLD) / (255 - REFLECTIVITY_THRESHOLD), 0, 1)
-                mapped_data = cmap(norm_data)
-                rgba_data = (mapped_data * 255).astype(np.uint8)
-                rgba_data[..., 3] = np.where(data == 0, 0, 204)  # Set transparency for 0 values, 204 for 0.8 alpha
+                # Min/max are full passes over the frame, so only compute them when debug logging is on
+                if logging.getLogger().isEnabledFor(logging.DEBUG):
+                    logging.debug(f"Forecast data from {file_path}: min {np.min(data)}, max {np.max(data)}")
 
-                forecast_image = Image.fromarray(rgba_data, 'RGBA')
-
-                # Resize the image to 1280 pixels in width
-                width, height = forecast_image.size
-                new_height = int(height * (1280 / width))
-                forecast_image = forecast_image.resize((1280, new_height), Image.Resampling.LANCZOS)
+                value = data.flat[0]
+                if (data == value).all():
+                    # A uniform frame is a single color, so skip the per-pixel colormap and resize
+                    color = tuple(RGBA_LUT[int(value)].tolist())
+                    forecast_image = Image.new('RGBA', output_size(data.shape), color)
+                else:
+                    forecast_image = render_radar_image(data.astype(np.uint8, copy=False))
 
                 try:
                     utc_time = extract_timestamp(file_name_without_ext)
@@ -377,17 +460,8 @@ def convert_forecast_hdf5_to_png():
                     logging.error(f"Error parsing timestamp: {e}")
 
                 png_path = os.path.join(FORECAST_FOLDER, file_name_without_ext + ".png")
-                
-                # Debug: Print file path before saving
-                print(f"Saving PNG file to: {png_path}")
-                
-                forecast_image.save(png_path)
-                
-                # Debug: Confirm file is saved
-                if os.path.exists(png_path):
-                    print(f"File saved successfully: {png_path}")
-                else:
-                    print(f"Failed to save file: {png_path}")
+                forecast_image.save(png_path, "PNG", optimize=False, compress_level=1)
+                logging.debug("Saved PNG file: %s", png_path)
         except FileNotFoundError as e:
             logging.error(f"File not found error: {e}")
         except Exception as e:
@@ -403,22 +477,55 @@ def convert_forecast_hdf5_to_png():
 
 
 # Upload Files to S3
+def load_upload_manifest():
+    try:
+        with open(UPLOAD_MANIFEST) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_upload_manifest(manifest):
+    # Write to a temporary file first so a crash never leaves a truncated manifest
+    temp_path = UPLOAD_MANIFEST + ".tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(temp_path, UPLOAD_MANIFEST)
+
+def file_sha256(file_path):
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _upload_one(file_path, s3_key):
+    try:
+        transfer.upload_file(file_path, BUCKET_NAME, s3_key, extra_args={'ACL': 'public-read'})
+        return True
+    except Exception as e:
+        logging.error(f"Error uploading file {file_path} to S3: {e}")
+        return False
+
 def upload_and_rename_files(folder, start_index):
     print(f"Starting upload of files from {folder}...")
-    files = [f for f in os.listdir(folder) if f.endswith('.png')]
-    files_with_timestamps = [(f, extract_timestamp(f)) for f in files]
-    files_with_timestamps = [f for f in files_with_timestamps if f[1] is not None]
-
-    files_with_timestamps.sort(key=lambda x: x[1])
+    # ISO-8601 file names sort chronologically, so a plain sort orders them by time
+    files = [f for f in sorted(snapshot(folder)) if f.endswith('.png') and extract_timestamp(f) is not None]
 
-    for idx, (filename, _) in enumerate(files_with_timestamps):
+    # Skip keys whose last uploaded content is identical to the file that would replace it
+    manifest = load_upload_manifest()
+    uploads = []
+    for idx, filename in enumerate(files):
         file_path = os.path.join(folder, filename)
         new_file_name = f"{start_index + idx}.png"
         s3_key = os.path.join(SUBFOLDER, new_file_name)
-        try:
-            s3_client.upload_file(file_path, BUCKET_NAME, s3_key, ExtraArgs={'ACL': 'public-read'})
-        except Exception as e:
-            logging.error(f"Error uploading file {file_path} to S3: {e}")
+        digest = file_sha256(file_path)
+        if manifest.get(s3_key) != digest:
+            uploads.append((file_path, s3_key, digest))
+
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+        results = list(executor.map(lambda job: _upload_one(job[0], job[1]), uploads))
+
+    for (_, s3_key, digest), uploaded in zip(uploads, results):
+        if uploaded:
+            manifest[s3_key] = digest
+    save_upload_manifest(manifest)
     print(f"Completed upload of files from {folder}.")
 
 # Main Loop and Execution
@@ -427,11 +534,16 @@ def main():
         if check_internet_connection():
             download_hdf5_files()
             convert_hdf5_to_png()
-            generate_forecast()
-            upload_and_rename_files(PNG_OUTPUT_FOLDER, 1)
+            # Upload the radar frames while the forecast is computed, so network and CPU work overlap
+            with ThreadPoolExecutor(max_workers=1) as uploader:
+                radar_upload = uploader.submit(upload_and_rename_files, PNG_OUTPUT_FOLDER, 1)
+                generate_forecast()
+                radar_upload.result()
             upload_and_rename_files(FORECAST_FOLDER, 21)
-        print("Pausing for 5 minutes...")
-        time.sleep(300)
+        # Sleep until the next 5-minute mark, so processing time does not make the cycle drift
+        next_run = (time.time() // CYCLE_SECONDS + 1) * CYCLE_SECONDS
+        print(f"Pausing until {datetime.fromtimestamp(next_run, timezone.utc):%H:%M:%S} UTC...")
+        time.sleep(max(0, next_run - time.time()))
 
 if __name__ == "__main__":
     main()